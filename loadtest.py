@@ -0,0 +1,318 @@
+"""Offline load test for the bot handlers.
+
+Drives the real handlers in main.py through a fake Client/Message/CallbackQuery
+layer, so no Telegram connection is needed. Each simulated user runs a full
+upload -> reorder -> merge -> remove page -> finish flow.
+
+    python loadtest.py --users 200 --rate 20 --workers 4
+"""
+import os
+import time
+import random
+import asyncio
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+# main.py refuses to import without credentials; the fake client never uses them
+os.environ.setdefault("API_ID", "0")
+os.environ.setdefault("API_HASH", "loadtest")
+os.environ.setdefault("BOT_TOKEN", "loadtest")
+
+import fitz
+import main
+
+CHUNK_SIZE = 1024 * 1024  # matches pyrogram's stream_media chunk size
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+
+
+class FakeChat:
+    def __init__(self, chat_id: int):
+        self.id = chat_id
+
+
+class FakeDocument:
+    def __init__(self, data: bytes, file_name: str, mime_type: str = "application/pdf",
+                 invalid: bool = False):
+        self.data = data
+        self.file_name = file_name
+        self.mime_type = mime_type
+        self.file_size = len(data)
+        self.invalid = invalid  # the bot is expected to reject it
+
+
+class FakeMessage:
+    """Stands in for pyrogram's Message; replies and edits only record text"""
+    _next_id = 0
+
+    def __init__(self, harness: "Harness", user_id: int, text: str = None, document: FakeDocument = None):
+        FakeMessage._next_id += 1
+        self.id = FakeMessage._next_id
+        self.harness = harness
+        self.from_user = FakeUser(user_id)
+        self.chat = FakeChat(user_id)
+        self.text = text
+        self.document = document
+        self.reply_markup = None
+
+    async def reply_text(self, text: str, reply_markup=None) -> "FakeMessage":
+        await self.harness.api_call()
+        reply = FakeMessage(self.harness, self.from_user.id, text=text)
+        reply.reply_markup = reply_markup
+        self.harness.last_message[self.from_user.id] = reply
+        self.harness.record_failure(self.from_user.id, text)
+        return reply
+
+    async def edit_text(self, text: str, reply_markup=None) -> "FakeMessage":
+        await self.harness.api_call()
+        self.harness.record_failure(self.from_user.id, text)
+        self.text = text
+        self.reply_markup = reply_markup
+        return self
+
+
+class FakeCallbackQuery:
+    def __init__(self, user_id: int, data: str, message: FakeMessage):
+        self.from_user = FakeUser(user_id)
+        self.data = data
+        self.message = message
+
+    async def answer(self, text: str = None, show_alert: bool = False):
+        await self.message.harness.api_call()
+        if show_alert:
+            # The flow never asks for info popups, so every alert is a refusal
+            self.message.harness.failures.setdefault(self.from_user.id, []).append(text)
+
+
+class FakeClient:
+    """Serves downloads from memory and swallows uploads at a fixed bandwidth"""
+    def __init__(self, harness: "Harness"):
+        self.harness = harness
+
+    async def stream_media(self, message: FakeMessage):
+        data = message.document.data
+        for offset in range(0, len(data), CHUNK_SIZE):
+            chunk = data[offset:offset + CHUNK_SIZE]
+            await self.harness.transfer(len(chunk))
+            yield chunk
+
+    async def send_document(self, chat_id: int, document: str, caption: str = None,
+                            file_name: str = None, progress=None):
+        total = os.path.getsize(document)
+        sent = 0
+        while sent < total:
+            step = min(CHUNK_SIZE, total - sent)
+            await self.harness.transfer(step)
+            sent += step
+            if progress:
+                await progress(sent, total)
+        return FakeMessage(self.harness, chat_id)
+
+
+def make_pdf(pages: int) -> bytes:
+    """Build a small text PDF with the given page count"""
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Load test page {i + 1}\n" + "lorem ipsum " * 200)
+    data = doc.tobytes(garbage=4, deflate=True)
+    doc.close()
+    return data
+
+
+def make_unique(data: bytes, tag: int) -> bytes:
+    """Insert a comment before the final %%EOF so each upload hashes differently"""
+    idx = data.rfind(b"%%EOF")
+    return data[:idx] + f"% upload {tag}\n".encode() + data[idx:]
+
+
+def parse_mix(spec: str) -> list[tuple[str, int]]:
+    """Parse 'pages:weight,...' where pages may also be 'invalid' or 'dup'"""
+    mix = []
+    for part in spec.split(","):
+        kind, weight = part.split(":")
+        mix.append((kind.strip(), int(weight)))
+    return mix
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+class Harness:
+    """Runs simulated users against the handlers and collects latencies"""
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.client = FakeClient(self)
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.rejected: dict[str, int] = {}
+        self.skipped: dict[str, int] = {}
+        self.failures: dict[int, list[str]] = {}
+        self.skips: dict[int, list[str]] = {}
+        self.loop_lag: list[float] = []
+        self.last_message: dict[int, FakeMessage] = {}
+        self.completed = 0
+        self.mix = parse_mix(args.mix)
+        self.uploads = 0
+        # Rendered up front: fitz on the measured loop would show up as loop lag
+        page_counts = {int(kind) for kind, _ in self.mix if kind.isdigit()} | {1}
+        self.pdf_cache: dict[int, bytes] = {pages: make_pdf(pages) for pages in page_counts}
+
+    async def api_call(self):
+        if self.args.api_latency:
+            await asyncio.sleep(self.args.api_latency / 1000)
+
+    async def transfer(self, num_bytes: int):
+        if self.args.bandwidth:
+            await asyncio.sleep(num_bytes / (self.args.bandwidth * 1024 * 1024))
+
+    def pick_file(self, uploaded: list[FakeDocument]) -> FakeDocument:
+        kinds, weights = zip(*self.mix)
+        kind = random.choices(kinds, weights)[0]
+        if kind == "dup" and uploaded:
+            return uploaded[-1]
+        if kind == "invalid":
+            return FakeDocument(os.urandom(64 * 1024), "broken.pdf", invalid=True)
+        pages = int(kind) if kind.isdigit() else 1
+        self.uploads += 1
+        data = make_unique(self.pdf_cache[pages], self.uploads)
+        return FakeDocument(data, f"doc_{pages}p_{self.uploads}.pdf")
+
+    async def timed(self, action: str, coro):
+        start = time.perf_counter()
+        await coro
+        self.latencies.setdefault(action, []).append(time.perf_counter() - start)
+
+    def record_failure(self, user_id: int, text: str):
+        if text and text.startswith("❗"):
+            self.failures.setdefault(user_id, []).append(text)
+        elif text and text.startswith("⚠️"):
+            self.skips.setdefault(user_id, []).append(text)
+
+    def check(self, action: str, user_id: int, expected: bool = False):
+        """Count outcomes of the last action: skips, expected rejections and errors"""
+        if self.skips.pop(user_id, None):
+            self.skipped[action] = self.skipped.get(action, 0) + 1
+        if not self.failures.pop(user_id, None):
+            return
+        counts = self.rejected if expected else self.errors
+        counts[action] = counts.get(action, 0) + 1
+
+    async def callback(self, user_id: int, data: str, message: FakeMessage):
+        await self.timed(data.rstrip("_0123456789") or data, main.handle_callback(
+            self.client, FakeCallbackQuery(user_id, data, message)
+        ))
+
+    async def run_user(self, user_id: int):
+        """One user's full upload/reorder/merge/finish flow"""
+        await self.timed("start", main.start_command(self.client, FakeMessage(self, user_id, text="/start")))
+
+        uploaded = []
+        for _ in range(random.randint(self.args.min_files, self.args.max_files)):
+            doc = self.pick_file(uploaded)
+            uploaded.append(doc)
+            await self.timed("upload", main.handle_document(self.client, FakeMessage(self, user_id, document=doc)))
+            self.check("upload", user_id, expected=doc.invalid)
+            await asyncio.sleep(random.uniform(0, self.args.think_time))
+
+        # With fewer than two accepted PDFs, refusing to merge is correct behaviour
+        too_few = len(main.get_session(user_id).pdfs) < 2
+        menu = self.last_message[user_id]
+        for data in ("view_order", "move_down_0", "sort_name", "done_reorder", "merge_pdfs", "remove_page"):
+            await self.callback(user_id, data, menu)
+            self.check(data.rstrip("_0123456789"), user_id, expected=too_few)
+            await asyncio.sleep(random.uniform(0, self.args.think_time))
+
+        await self.timed("remove_page_text", main.handle_text(self.client, FakeMessage(self, user_id, text="1")))
+        self.check("remove_page_text", user_id, expected=too_few)
+
+        await self.callback(user_id, "finish", self.last_message[user_id])
+        self.check("finish", user_id, expected=too_few)
+
+        main.get_session(user_id).clear()
+        self.completed += 1
+
+    async def monitor_lag(self, interval: float = 0.05):
+        """Sample how late the loop wakes a sleeping task"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(time.perf_counter() - start - interval)
+
+    async def run(self):
+        monitor = asyncio.create_task(self.monitor_lag())
+        users = []
+        start = time.perf_counter()
+
+        for i in range(self.args.users):
+            users.append(asyncio.create_task(self.run_user(10_000_000 + i)))
+            await asyncio.sleep(random.expovariate(self.args.rate))
+        await asyncio.gather(*users)
+
+        elapsed = time.perf_counter() - start
+        monitor.cancel()
+        self.report(elapsed)
+
+    def report(self, elapsed: float):
+        total_actions = sum(len(v) for v in self.latencies.values())
+        print(f"\n{'action':<18}{'count':>7}{'errors':>8}{'rejected':>10}{'skipped':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for action, values in sorted(self.latencies.items()):
+            print(
+                f"{action:<18}{len(values):>7}{self.errors.get(action, 0):>8}{self.rejected.get(action, 0):>10}"
+                f"{self.skipped.get(action, 0):>9}"
+                f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+                f"{percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}"
+            )
+        print(
+            f"\nloop lag ms: p50 {percentile(self.loop_lag, 50) * 1000:.1f}"
+            f" | p95 {percentile(self.loop_lag, 95) * 1000:.1f}"
+            f" | p99 {percentile(self.loop_lag, 99) * 1000:.1f}"
+            f" | max {max(self.loop_lag, default=0) * 1000:.1f}"
+        )
+        print(
+            f"throughput: {self.completed} flows in {elapsed:.1f}s"
+            f" ({self.completed / elapsed:.2f} flows/s, {total_actions / elapsed:.1f} actions/s)"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test for the PDF merger bot")
+    parser.add_argument("--users", type=int, default=100, help="simulated users")
+    parser.add_argument("--rate", type=float, default=10.0, help="user arrivals per second (Poisson)")
+    parser.add_argument("--min-files", type=int, default=2, help="min uploads per user")
+    parser.add_argument("--max-files", type=int, default=6, help="max uploads per user")
+    parser.add_argument("--mix", default="1:40,5:30,50:15,invalid:10,dup:5",
+                        help="file mix as pages:weight, plus 'invalid' and 'dup'")
+    parser.add_argument("--think-time", type=float, default=0.5, help="max seconds between user actions")
+    parser.add_argument("--api-latency", type=float, default=20.0, help="ms per fake Telegram API call")
+    parser.add_argument("--bandwidth", type=float, default=20.0, help="fake transfer MB/s (0 = unlimited)")
+    parser.add_argument("--workers", type=int, default=main.PDF_WORKERS,
+                        help="PDF worker processes (0 = run fitz calls in threads)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    random.seed(args.seed)
+    logging.getLogger("main").setLevel(logging.ERROR)
+
+    if args.workers:
+        main.pdf_pool = ProcessPoolExecutor(max_workers=args.workers)
+        warmups = [main.pdf_pool.submit(main.warm_pdf_worker) for _ in range(args.workers)]
+        for future in warmups:
+            future.result()
+    try:
+        asyncio.run(Harness(args).run())
+    finally:
+        if main.pdf_pool:
+            main.pdf_pool.shutdown()
@@ -1,10 +1,21 @@
 import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
 import logging
 import tempfile
+import threading
+import traceback
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional
 import fitz
 from dotenv import load_dotenv
-from pyrogram import Client, filters
+from pyrogram import Client, filters, idle
+from pyrogram.errors import FloodWait, InternalServerError
 from pyrogram.types import (
     Message,
     CallbackQuery,
@@ -18,6 +29,21 @@ API_HASH = os.getenv("API_HASH", "YOUR_API_HASH")
 BOT_TOKEN = os.getenv("BOT_TOKEN", "YOUR_BOT_TOKEN")
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 BATCH_TIMEOUT = 30  # seconds to wait for batch uploads
+PROGRESS_INTERVAL = 2  # seconds between progress message edits
+PDF_HEADER_WINDOW = 1024  # %PDF- must appear within the first 1KB
+PDF_TRAILER_WINDOW = 1024  # %%EOF must appear within the last 1KB
+UPLOAD_RETRIES = 3  # attempts to send a result before giving up
+MAX_FLOOD_WAIT = 60  # seconds; longer flood waits fail the upload instead
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 2))
+SESSION_FILE = os.getenv("SESSION_FILE", "sessions.json")
+TEMP_DIR = os.path.join(tempfile.gettempdir(), "pdf_merger_bot")  # only the bot writes here
+TEMP_MAX_AGE = 24 * 60 * 60  # seconds before orphaned temp PDFs are swept
+LOOP_LAG_INTERVAL = 0.1  # seconds between event loop heartbeats
+LOOP_LAG_THRESHOLD = 0.25  # seconds of lag before a stall is logged with a stack
+PROFILE_INTERVAL = 0.01  # seconds between stack samples while profiling
+PROFILE_MAX_SECONDS = 300  # longest /profile run an admin can request
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+ADMIN_IDS = [int(uid) for uid in os.getenv("ADMIN_IDS", "").split(",") if uid.strip()]
 
 if API_ID == "YOUR_API_ID" or API_HASH == "YOUR_API_HASH" or BOT_TOKEN == "YOUR_BOT_TOKEN":
     raise ValueError("Please set API_ID, API_HASH, and BOT_TOKEN environment variables!")
@@ -29,17 +55,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+os.makedirs(TEMP_DIR, exist_ok=True)
+
 
 user_sessions = {}
+pdf_pool: Optional[ProcessPoolExecutor] = None
 
 class PDFInfo:
     """Store PDF metadata"""
-    def __init__(self, path: str, filename: str, pages: int, size: float, order: int):
+    def __init__(self, path: str, filename: str, pages: int, size: float, order: int,
+                 file_hash: Optional[str] = None):
         self.path = path
         self.filename = filename
         self.pages = pages
         self.size = size
         self.order = order
+        self.file_hash = file_hash
 
 class UserSession:
     """Manages user's PDF editing session"""
@@ -56,6 +87,10 @@ class UserSession:
         self.pdfs.append(pdf_info)
         self.is_merged = False
     
+    def has_hash(self, file_hash: str) -> bool:
+        """Check whether a PDF with this content is already in the session"""
+        return any(pdf.file_hash == file_hash for pdf in self.pdfs)
+    
     def swap_pdfs(self, idx1: int, idx2: int):
         """Swap two PDFs in the list"""
         if 0 <= idx1 < len(self.pdfs) and 0 <= idx2 < len(self.pdfs):
@@ -94,6 +129,57 @@ def get_session(user_id: int) -> UserSession:
     return user_sessions[user_id]
 
 
+def save_sessions(path: str = SESSION_FILE):
+    """Persist active sessions so a restart doesn't lose users' uploads"""
+    data = []
+    for session in user_sessions.values():
+        if not session.pdfs:
+            continue
+        data.append({
+            "user_id": session.user_id,
+            "pdfs": [vars(pdf) for pdf in session.pdfs],
+            "state": session.state,
+            "temp_data": session.temp_data,
+            "is_merged": session.is_merged,
+            "batch_mode": session.batch_mode
+        })
+    with open(path, "w") as f:
+        json.dump(data, f)
+    logger.info(f"Saved {len(data)} sessions to {path}")
+
+
+def restore_sessions(path: str = SESSION_FILE):
+    """Reload persisted sessions, dropping PDFs whose temp files are gone"""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Failed to load sessions from {path}: {e}")
+        return
+    
+    restored = 0
+    for entry in data:
+        # A bad entry (e.g. saved by an older version) only loses that session
+        try:
+            pdfs = [PDFInfo(**pdf) for pdf in entry["pdfs"] if os.path.exists(pdf["path"])]
+            if not pdfs:
+                continue
+            session = UserSession(entry["user_id"])
+            session.pdfs = pdfs
+            session.state = entry["state"]
+            session.temp_data = entry["temp_data"]
+            session.is_merged = entry["is_merged"]
+            session.batch_mode = entry["batch_mode"]
+        except Exception as e:
+            logger.error(f"Skipping unreadable session entry {entry!r:.200}: {e}")
+            continue
+        user_sessions[session.user_id] = session
+        restored += 1
+    logger.info(f"Restored {restored} sessions from {path}")
+
+
 def create_main_menu(pdf_count: int, is_merged: bool = False, batch_mode: bool = False) -> InlineKeyboardMarkup:
     """Create dynamic menu based on PDF count and merge status"""
     buttons = []
@@ -226,6 +312,10 @@ def get_pdf_page_count(pdf_path: str) -> Optional[int]:
     """Get the number of pages in a PDF"""
     try:
         doc = fitz.open(pdf_path)
+        if doc.needs_pass:
+            logger.error(f"PDF is encrypted: {pdf_path}")
+            doc.close()
+            return None
         page_count = doc.page_count
         doc.close()
         return page_count
@@ -234,6 +324,72 @@ def get_pdf_page_count(pdf_path: str) -> Optional[int]:
         return None
 
 
+def warm_pdf_worker() -> int:
+    """Exercise fitz open/insert/save so the first real job doesn't pay for it"""
+    src = fitz.open()
+    src.new_page()
+    dst = fitz.open()
+    dst.insert_pdf(src)
+    dst.tobytes(garbage=4, deflate=True)
+    dst.close()
+    src.close()
+    return os.getpid()
+
+
+def replace_pdf_pool(broken: ProcessPoolExecutor):
+    """Swap a broken worker pool for a fresh one and warm it in the background"""
+    global pdf_pool
+    if pdf_pool is not broken:
+        return  # another task already replaced it
+    
+    logger.error("PDF worker pool broke (worker crashed or was killed), restarting it")
+    broken.shutdown(wait=False, cancel_futures=True)
+    pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    for _ in range(PDF_WORKERS):
+        pdf_pool.submit(warm_pdf_worker)
+
+
+async def run_pdf_task(func, *args):
+    """Run a blocking PDF function in the worker pool.
+    
+    A crashing worker breaks the whole pool and fails every job in it, so
+    affected jobs are retried in a throwaway single-worker process; only a
+    job that crashes again is reported as failed.
+    """
+    loop = asyncio.get_running_loop()
+    pool = pdf_pool
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        replace_pdf_pool(pool)
+    
+    isolated = ProcessPoolExecutor(max_workers=1)
+    try:
+        return await loop.run_in_executor(isolated, func, *args)
+    finally:
+        isolated.shutdown(wait=False)
+
+
+def sweep_temp_dir(in_use: set[str], max_age: int = TEMP_MAX_AGE) -> int:
+    """Remove stale PDFs from the bot's temp dir whose paths are not in in_use"""
+    cutoff = time.time() - max_age
+    removed = 0
+    
+    for name in os.listdir(TEMP_DIR):
+        if not name.endswith(".pdf"):
+            continue
+        path = os.path.join(TEMP_DIR, name)
+        try:
+            if path not in in_use and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except Exception as e:
+            logger.error(f"Failed to sweep {path}: {e}")
+    
+    logger.info(f"Swept {removed} stale temp PDFs from {TEMP_DIR}")
+    return removed
+
+
 def get_pdf_size_mb(pdf_path: str) -> float:
     """Get PDF file size in MB"""
     try:
@@ -242,6 +398,240 @@ def get_pdf_size_mb(pdf_path: str) -> float:
         return 0.0
 
 
+class SamplingProfile:
+    """Collapsed-stack samples of the event loop thread.
+    
+    A target limits samples to stacks running a given handler (by function
+    name) or working on a given user's session (by user id).
+    """
+    def __init__(self, duration: float, target: Optional[str] = None):
+        self.target = target
+        self.deadline = time.monotonic() + duration
+        self.stacks = Counter()
+        self.samples = 0
+    
+    def matches(self, frames: list) -> bool:
+        if self.target is None:
+            return True
+        for frame, _ in frames:
+            if frame.f_code.co_name == self.target:
+                return True
+            session = frame.f_locals.get("session")
+            if isinstance(session, UserSession) and str(session.user_id) == self.target:
+                return True
+        return False
+    
+    def sample(self, frame):
+        frames = list(traceback.walk_stack(frame))
+        self.samples += 1
+        if not self.matches(frames):
+            return
+        key = ";".join(
+            f"{f.f_code.co_name} ({os.path.basename(f.f_code.co_filename)}:{lineno})"
+            for f, lineno in reversed(frames)
+        )
+        self.stacks[key] += 1
+    
+    def write(self, directory: str = PROFILE_DIR) -> str:
+        """Write samples in collapsed format (one 'stack count' per line) for flamegraph tools"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory,
+            f"profile_{time.strftime('%Y%m%d_%H%M%S')}_{self.target or 'all'}.txt"
+        )
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class LoopWatchdog:
+    """Measures event loop lag and captures what is blocking the loop.
+    
+    A heartbeat task records how late each sleep wakes up; a daemon thread
+    notices when the heartbeat stops and logs the loop thread's stack, so
+    blocking calls show up in logs with the line that caused them.
+    """
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag_samples = deque(maxlen=3000)
+        self.stalls = 0
+        self.last_tick = time.monotonic()
+        self.loop_thread_id = None
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        self.profile: Optional[SamplingProfile] = None
+        self.lock = threading.Lock()
+    
+    def start(self):
+        # Boot time before start() is not loop lag
+        self.last_tick = time.monotonic()
+        self.heartbeat_task = asyncio.get_running_loop().create_task(self.heartbeat())
+        threading.Thread(target=self.watch, name="loop-watchdog", daemon=True).start()
+    
+    async def heartbeat(self):
+        self.loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.last_tick = time.monotonic()
+            lag = self.last_tick - start - self.interval
+            self.lag_samples.append(lag)
+            if lag > self.threshold:
+                logger.warning(f"Event loop lagged {lag:.2f}s")
+    
+    def watch(self):
+        stalled = False
+        while True:
+            time.sleep(PROFILE_INTERVAL if self.profile else self.interval / 2)
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            
+            with self.lock:
+                if self.profile and time.monotonic() < self.profile.deadline:
+                    self.profile.sample(frame)
+            
+            blocked = time.monotonic() - self.last_tick - self.interval
+            if blocked > self.threshold and not stalled:
+                stalled = True
+                self.stalls += 1
+                logger.warning(
+                    f"Event loop blocked for {blocked:.2f}s in:\n"
+                    + "".join(traceback.format_stack(frame))
+                )
+            elif blocked <= self.threshold:
+                stalled = False
+    
+    def start_profile(self, duration: float, target: Optional[str] = None) -> bool:
+        with self.lock:
+            if self.profile:
+                return False
+            self.profile = SamplingProfile(duration, target)
+            return True
+    
+    def stop_profile(self) -> Optional[SamplingProfile]:
+        with self.lock:
+            profile, self.profile = self.profile, None
+        return profile
+    
+    def lag_summary(self) -> str:
+        lags = sorted(self.lag_samples)
+        if not lags:
+            return "No lag samples yet"
+        p50 = lags[len(lags) // 2] * 1000
+        p99 = lags[min(len(lags) - 1, len(lags) * 99 // 100)] * 1000
+        return (
+            f"p50 {p50:.1f}ms | p99 {p99:.1f}ms | max {lags[-1] * 1000:.1f}ms\n"
+            f"{len(lags)} samples, {self.stalls} stalls"
+        )
+
+
+watchdog = LoopWatchdog()
+
+
+class ProgressReporter:
+    """Coalesces transfer progress into throttled status message edits"""
+    def __init__(self, status_msg: Message, label: str):
+        self.status_msg = status_msg
+        self.label = label
+        self.last_update = time.monotonic()
+    
+    async def update(self, current: int, total: int):
+        now = time.monotonic()
+        if now - self.last_update < PROGRESS_INTERVAL or current >= total:
+            return
+        self.last_update = now
+        try:
+            await self.status_msg.edit_text(
+                f"{self.label}... {current * 100 // total}%\n"
+                f"💾 {current / (1024 * 1024):.1f}/{total / (1024 * 1024):.1f}MB"
+            )
+        except Exception:
+            pass
+
+
+def log_throughput(action: str, num_bytes: int, start: float):
+    """Log transfer size, duration and rate"""
+    elapsed = max(time.monotonic() - start, 1e-6)
+    size_mb = num_bytes / (1024 * 1024)
+    logger.info(f"{action} {size_mb:.2f}MB in {elapsed:.2f}s ({size_mb / elapsed:.2f}MB/s)")
+
+
+class InvalidPDFError(Exception):
+    """Raised when a download fails the early PDF sanity checks"""
+
+
+async def download_pdf(client: Client, message: Message, file_path: str, status_msg: Message) -> str:
+    """Stream a document to disk, validating and hashing it as it arrives.
+    
+    Aborts as soon as the first chunk lacks a PDF header, so bad uploads
+    don't cost a full download. Returns the SHA-256 hex digest.
+    """
+    total = message.document.file_size
+    progress = ProgressReporter(status_msg, "⏳ Downloading")
+    hasher = hashlib.sha256()
+    received = 0
+    tail = b""
+    start = time.monotonic()
+    
+    try:
+        with open(file_path, "wb") as f:
+            async for chunk in client.stream_media(message):
+                if received == 0 and b"%PDF-" not in chunk[:PDF_HEADER_WINDOW]:
+                    raise InvalidPDFError("missing %PDF- header")
+                
+                f.write(chunk)
+                hasher.update(chunk)
+                received += len(chunk)
+                tail = (tail + chunk)[-PDF_TRAILER_WINDOW:]
+                await progress.update(received, total)
+        
+        if b"%%EOF" not in tail:
+            raise InvalidPDFError("missing %%EOF trailer")
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    
+    log_throughput("Downloaded", received, start)
+    return hasher.hexdigest()
+
+
+async def upload_pdf(client: Client, chat_id: int, pdf_info: PDFInfo, status_msg: Message):
+    """Send a PDF with live progress, retrying on FloodWait and transient errors"""
+    progress = ProgressReporter(status_msg, "📤 Uploading")
+    
+    for attempt in range(1, UPLOAD_RETRIES + 1):
+        start = time.monotonic()
+        try:
+            await client.send_document(
+                chat_id=chat_id,
+                document=pdf_info.path,
+                caption="✅ Here's your PDF!",
+                file_name=pdf_info.filename,
+                progress=progress.update
+            )
+            log_throughput("Uploaded", os.path.getsize(pdf_info.path), start)
+            return
+        except FloodWait as e:
+            if attempt == UPLOAD_RETRIES or e.value > MAX_FLOOD_WAIT:
+                raise
+            logger.warning(f"FloodWait on upload, sleeping {e.value}s (attempt {attempt})")
+            await asyncio.sleep(e.value)
+        except FileNotFoundError:
+            raise
+        except (OSError, InternalServerError) as e:
+            # Only transient failures; anything else may already have been
+            # delivered, and re-sending would duplicate the document
+            if attempt == UPLOAD_RETRIES:
+                raise
+            delay = 2 ** attempt
+            logger.warning(f"Upload failed: {e}, retrying in {delay}s (attempt {attempt})")
+            await asyncio.sleep(delay)
+
+
 app = Client(
     "pdf_merger_bot",
     api_id=API_ID,
@@ -311,6 +701,45 @@ async def help_command(client: Client, message: Message):
     )
 
 
+@app.on_message(filters.command("lag") & filters.user(ADMIN_IDS))
+async def lag_command(client: Client, message: Message):
+    """Handle /lag admin command"""
+    await message.reply_text(f"⏱ **Event Loop Lag**\n\n{watchdog.lag_summary()}")
+
+
+@app.on_message(filters.command("profile") & filters.user(ADMIN_IDS))
+async def profile_command(client: Client, message: Message):
+    """Handle /profile <seconds> [handler name | user id] admin command"""
+    args = message.command[1:]
+    if not args or not args[0].isdigit():
+        await message.reply_text("Usage: /profile <seconds> [handler name | user id]")
+        return
+    
+    duration = min(int(args[0]), PROFILE_MAX_SECONDS)
+    target = args[1] if len(args) > 1 else None
+    # The target ends up in the output filename, so only allow names and ids
+    if target is not None and not (target.isidentifier() or target.isdigit()):
+        await message.reply_text("❗ Target must be a handler name or a user id.")
+        return
+    
+    if not watchdog.start_profile(duration, target):
+        await message.reply_text("❗ A profile is already running.")
+        return
+    
+    try:
+        status_msg = await message.reply_text(f"🔬 Profiling {target or 'all handlers'} for {duration}s...")
+        await asyncio.sleep(duration)
+    finally:
+        profile = watchdog.stop_profile()
+    
+    path = await asyncio.get_running_loop().run_in_executor(None, profile.write)
+    await status_msg.edit_text(
+        f"✅ **Profile Saved**\n\n"
+        f"📁 {path}\n"
+        f"📊 {sum(profile.stacks.values())}/{profile.samples} samples matched"
+    )
+
+
 @app.on_message(filters.document)
 async def handle_document(client: Client, message: Message):
     """Handle incoming PDF documents with batch support"""
@@ -339,15 +768,24 @@ async def handle_document(client: Client, message: Message):
     )
     
     try:
-        temp_dir = tempfile.gettempdir()
         file_path = os.path.join(
-            temp_dir,
+            TEMP_DIR,
             f"pdf_{message.from_user.id}_{len(session.pdfs)}_{message.id}.pdf"
         )
         
-        await message.download(file_path)
+        try:
+            file_hash = await download_pdf(client, message, file_path, status_msg)
+        except InvalidPDFError as e:
+            logger.warning(f"Rejected upload from {message.from_user.id}: {e}")
+            await status_msg.edit_text("❗ Invalid or corrupted PDF file.")
+            return
+        
+        if session.has_hash(file_hash):
+            os.remove(file_path)
+            await status_msg.edit_text("⚠️ This PDF was already added, skipping.")
+            return
         
-        page_count = get_pdf_page_count(file_path)
+        page_count = await run_pdf_task(get_pdf_page_count, file_path)
         if page_count is None:
             await status_msg.edit_text("❗ Invalid or corrupted PDF file.")
             os.remove(file_path)
@@ -362,7 +800,8 @@ async def handle_document(client: Client, message: Message):
             filename=filename,
             pages=page_count,
             size=file_size,
-            order=len(session.pdfs)
+            order=len(session.pdfs),
+            file_hash=file_hash
         )
         
         session.add_pdf(pdf_info)
@@ -584,13 +1023,20 @@ async def handle_callback(client: Client, callback: CallbackQuery):
             )
             
             output_path = os.path.join(
-                tempfile.gettempdir(),
+                TEMP_DIR,
                 f"merged_{callback.from_user.id}.pdf"
             )
             
             pdf_paths = [pdf.path for pdf in session.pdfs]
             
-            if merge_pdfs(pdf_paths, output_path):
+            merge_start = time.monotonic()
+            if await run_pdf_task(merge_pdfs, pdf_paths, output_path):
+                log_throughput(
+                    f"Merged {total_pdfs} PDFs / {total_pages} pages,",
+                    os.path.getsize(output_path),
+                    merge_start
+                )
+                
                 # Clean up individual PDFs
                 for pdf in session.pdfs:
                     try:
@@ -599,7 +1045,7 @@ async def handle_callback(client: Client, callback: CallbackQuery):
                         pass
                 
                 # Create new merged PDF info
-                page_count = get_pdf_page_count(output_path)
+                page_count = await run_pdf_task(get_pdf_page_count, output_path)
                 file_size = get_pdf_size_mb(output_path)
                 
                 merged_pdf = PDFInfo(
@@ -647,12 +1093,7 @@ async def handle_callback(client: Client, callback: CallbackQuery):
             try:
                 pdf_info = session.pdfs[0]
                 
-                await client.send_document(
-                    chat_id=callback.message.chat.id,
-                    document=pdf_info.path,
-                    caption="✅ Here's your PDF!",
-                    file_name=pdf_info.filename
-                )
+                await upload_pdf(client, callback.message.chat.id, pdf_info, callback.message)
                 
                 session.clear()
                 await callback.message.edit_text(
@@ -707,15 +1148,15 @@ async def handle_text(client: Client, message: Message):
         pdf_info = session.pdfs[pdf_idx]
         input_path = pdf_info.path
         output_path = os.path.join(
-            tempfile.gettempdir(),
+            TEMP_DIR,
             f"modified_{message.from_user.id}_{pdf_idx}.pdf"
         )
         
-        if remove_page_from_pdf(input_path, output_path, page_num):
+        if await run_pdf_task(remove_page_from_pdf, input_path, output_path, page_num):
             os.remove(input_path)
             
             # Update PDF info
-            new_page_count = get_pdf_page_count(output_path)
+            new_page_count = await run_pdf_task(get_pdf_page_count, output_path)
             new_file_size = get_pdf_size_mb(output_path)
             
             session.pdfs[pdf_idx] = PDFInfo(
@@ -742,6 +1183,48 @@ async def handle_text(client: Client, message: Message):
         await status_msg.edit_text("❗ Error removing page. Please try again.")
 
 
+def log_sweep_failure(future: asyncio.Future):
+    """Surface errors from the background temp dir sweep"""
+    if not future.cancelled() and future.exception():
+        logger.error(f"Temp dir sweep failed: {future.exception()}")
+
+
+async def main():
+    """Warm up, then start serving; the bot only takes updates once warm"""
+    global pdf_pool
+    loop = asyncio.get_running_loop()
+    boot_start = phase_start = time.monotonic()
+    
+    pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    pids = await asyncio.gather(*(
+        loop.run_in_executor(pdf_pool, warm_pdf_worker) for _ in range(PDF_WORKERS)
+    ))
+    logger.info(f"Warmed {len(set(pids))} PDF workers in {time.monotonic() - phase_start:.2f}s")
+    
+    phase_start = time.monotonic()
+    restore_sessions()
+    logger.info(f"Restored sessions in {time.monotonic() - phase_start:.2f}s")
+    
+    watchdog.start()
+    
+    # Runs after restore so files referenced by restored sessions are kept
+    in_use = {pdf.path for session in user_sessions.values() for pdf in session.pdfs}
+    sweep = loop.run_in_executor(None, sweep_temp_dir, in_use)
+    sweep.add_done_callback(log_sweep_failure)
+    
+    phase_start = time.monotonic()
+    await app.start()
+    logger.info(f"Connected in {time.monotonic() - phase_start:.2f}s")
+    logger.info(f"Bot ready after {time.monotonic() - boot_start:.2f}s")
+    
+    try:
+        await idle()
+    finally:
+        await app.stop()
+        save_sessions()
+        pdf_pool.shutdown()
+
+
 if __name__ == "__main__":
     print("=" * 50)
     print("🤖 PDF Merger Bot - Large Batch Support")
@@ -754,4 +1237,4 @@ if __name__ == "__main__":
     print("\n🚀 Starting bot...")
     print("⚠️  Press Ctrl+C to stop\n")
     
-    app.run()
+    app.run(main())